@@ -5,17 +5,30 @@ Vercel-compatible entry point
 """
 
 import os
-import uuid
+import atexit
+import re
+import sys
+import time
+import secrets
+import queue
 import logging
-from datetime import datetime, timedelta
+import threading
+from typing import Annotated, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from cachetools import TTLCache
 from flask import Flask, request, jsonify
-from flask_cors import CORS
-from dotenv import load_dotenv
 import requests
-import json
+from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
+import msgspec
 
-# Load environment variables
-load_dotenv()
+# Load environment variables from .env for local runs - Vercel injects them directly
+if not os.getenv('VERCEL'):
+    from dotenv import load_dotenv
+    load_dotenv()
 
 # Configure logging
 logging.basicConfig(
@@ -26,18 +39,27 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-# Simple CORS - allow all origins
-CORS(app, origins="*")
+# Simple CORS - allow all origins (preflight middleware + after_request below)
+class PreflightMiddleware:
+    """Answer CORS preflight (OPTIONS) requests at the WSGI layer, before Flask builds a request context"""
 
-# Add before_request to handle CORS for all requests
-@app.before_request
-def handle_preflight():
-    if request.method == "OPTIONS":
-        response = jsonify({'status': 'ok'})
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
-        return response, 200
+    HEADERS = [
+        ('Access-Control-Allow-Origin', '*'),
+        ('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS'),
+        ('Access-Control-Allow-Headers', 'Content-Type, Authorization'),
+        ('Access-Control-Max-Age', '86400'),
+    ]
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        if environ['REQUEST_METHOD'] == 'OPTIONS':
+            start_response('204 No Content', list(self.HEADERS))
+            return []
+        return self.wsgi_app(environ, start_response)
+
+app.wsgi_app = PreflightMiddleware(app.wsgi_app)
 
 # Add after_request to ensure CORS headers are always present
 @app.after_request
@@ -46,7 +68,7 @@ def after_request(response):
     response.headers['Access-Control-Allow-Origin'] = '*'
     response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
     response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
-    response.headers['Access-Control-Max-Age'] = '3600'
+    response.headers['Access-Control-Max-Age'] = '86400'
     return response
 
 # Configuration
@@ -57,92 +79,299 @@ SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 if not SUPABASE_URL or not SUPABASE_KEY:
     logger.warning("SUPABASE_URL and SUPABASE_KEY not set - using memory storage only")
 
-# In-memory token store (for testing - use Supabase for production)
-TOKEN_STORE = {}
-
-def store_token_in_memory(token, stream_url, media_type, media_id, media_title, season_number, episode_number, description=None):
-    """Store token in memory (for testing)"""
-    TOKEN_STORE[token] = {
-        'stream_url': stream_url,
-        'media_type': media_type,
-        'media_id': media_id,
-        'media_title': media_title,
-        'season_number': season_number,
-        'episode_number': episode_number,
-        'description': description,
-        'created_at': datetime.utcnow().isoformat(),
-        'expires_at': (datetime.utcnow() + timedelta(seconds=API_TOKEN_EXPIRY)).isoformat(),
-        'accessed_count': 0
-    }
+# Shared HTTP session so Supabase calls reuse keep-alive connections
+# pool_maxsize should match the worker's request concurrency
+SUPABASE_POOL_MAXSIZE = int(os.getenv('SUPABASE_POOL_MAXSIZE', '50'))
+
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=SUPABASE_POOL_MAXSIZE,
+    # Token inserts are upserts, so POST is safe to retry alongside the idempotent methods
+    # read=0: a request that timed out waiting for a response is not retried (would multiply the timeout)
+    max_retries=Retry(total=2, read=0, backoff_factor=0.1, status_forcelist=[502, 503, 504],
+                      allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {'POST'})
+))
+# (connect, read) seconds - only the short connect attempts are retried, slow responses are not
+SUPABASE_TIMEOUT = (1, 5)
+if SUPABASE_KEY:
+    SESSION.headers.update({
+        'Authorization': f'Bearer {SUPABASE_KEY}',
+        'apikey': SUPABASE_KEY,
+        'Content-Type': 'application/json'
+    })
+
+# Supabase endpoints and per-call headers never change, so build them once
+# The select list is the TokenRecord columns; a lookup URL is _SELECT_URL_TEMPLATE + quoted token
+_INSERT_URL = f'{SUPABASE_URL}/rest/v1/stream_urls?on_conflict=token'
+_SELECT_URL_TEMPLATE = (
+    f'{SUPABASE_URL}/rest/v1/stream_urls'
+    '?select=stream_url,media_type,media_id,media_title,season_number,episode_number,'
+    'description,created_at,expires_at,accessed_count&limit=1&token=eq.'
+)
+_WRITE_HEADERS = {'Prefer': 'resolution=merge-duplicates,return=minimal'}
+_READ_HEADERS = {'Accept-Profile': 'public'}
+
+# Batched Supabase writes - tokens are queued and inserted by a background thread, and drained at exit
+# On Vercel (VERCEL set) rows are inserted inline instead
+# Up to SUPABASE_MAX_INFLIGHT batches are sent concurrently so one slow insert doesn't stall the rest
+SUPABASE_BATCH_SIZE = 50
+SUPABASE_MAX_WAIT_MS = 20
+SUPABASE_MAX_INFLIGHT = 4
+SUPABASE_INLINE_WRITES = bool(os.getenv('VERCEL'))
+_PENDING = queue.Queue()
+_STOP_FLUSH = object()
+_FLUSH_THREAD = None
+_FLUSH_SLOTS = threading.BoundedSemaphore(SUPABASE_MAX_INFLIGHT)
+_FLUSH_POOL = ThreadPoolExecutor(max_workers=SUPABASE_MAX_INFLIGHT, thread_name_prefix='supabase-insert')
+
+# In-memory token store - read-through cache in front of Supabase, entries drop out after API_TOKEN_EXPIRY
+# maxsize is a hard cap on memory; the least recently used tokens are evicted first
+TOKEN_STORE_MAXSIZE = 100_000
+TOKEN_STORE_SWEEP_INTERVAL = 60  # seconds
+TOKEN_STORE = TTLCache(maxsize=TOKEN_STORE_MAXSIZE, ttl=API_TOKEN_EXPIRY)
+_STORE_LOCK = threading.Lock()
+
+def sweep_expired_tokens():
+    """Background loop: drop expired tokens so memory is reclaimed even without reads"""
+    while True:
+        time.sleep(TOKEN_STORE_SWEEP_INTERVAL)
+        with _STORE_LOCK:
+            TOKEN_STORE.expire()
+
+threading.Thread(target=sweep_expired_tokens, name='token-sweeper', daemon=True).start()
+
+def parse_timestamp(value):
+    """Parse an ISO timestamp from Supabase into a Unix timestamp (naive values are UTC)"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def format_timestamp(ts):
+    """Format a Unix timestamp as a naive UTC ISO string"""
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat()
+
+class TokenRecord:
+    """In-memory token data - slotted so each record avoids a per-instance dict"""
+    __slots__ = ('stream_url', 'media_type', 'media_id', 'media_title', 'season_number', 'episode_number',
+                 'description', 'created_at', 'expires_at', 'accessed_count')
+
+    def __init__(self, stream_url, media_type, media_id, media_title, season_number, episode_number,
+                 description, created_at, expires_at, accessed_count=0):
+        self.stream_url = stream_url
+        self.media_type = media_type
+        self.media_id = media_id
+        self.media_title = media_title
+        self.season_number = season_number
+        self.episode_number = episode_number
+        self.description = description
+        self.created_at = created_at
+        self.expires_at = expires_at
+        self.accessed_count = accessed_count
+
+    def to_dict(self):
+        """JSON-ready dict with timestamps formatted as ISO strings"""
+        return {
+            'stream_url': self.stream_url,
+            'media_type': self.media_type,
+            'media_id': self.media_id,
+            'media_title': self.media_title,
+            'season_number': self.season_number,
+            'episode_number': self.episode_number,
+            'description': self.description,
+            'created_at': format_timestamp(self.created_at),
+            'expires_at': format_timestamp(self.expires_at),
+            'accessed_count': self.accessed_count
+        }
+
+# Pool of shared strings for fields most tokens repeat (titles of the same series, descriptions)
+# Capped so user-supplied values can't grow it without bound
+_INTERN = {}
+_INTERN_MAXSIZE = 10_000
+_MEDIA_TYPES = {value: sys.intern(value) for value in ('movie', 'tv')}
+
+def _intern(value):
+    """Return a shared copy of value so equal strings across records are stored once"""
+    if not value or not isinstance(value, str):
+        return value
+    if len(_INTERN) >= _INTERN_MAXSIZE:
+        return _INTERN.get(value, value)
+    return _INTERN.setdefault(value, value)
+
+def store_token_in_memory(token, stream_url, media_type, media_id, media_title, season_number, episode_number, description=None,
+                          created_at=None, expires_at=None, accessed_count=0):
+    """Store token in memory"""
+    # Only the known media types go through sys.intern - interned strings can be immortal (CPython 3.12)
+    media_type = _MEDIA_TYPES.get(media_type, media_type) if isinstance(media_type, str) else media_type
+    if created_at is None:
+        created_at = time.time()
+    if expires_at is None:
+        expires_at = created_at + API_TOKEN_EXPIRY
+    record = TokenRecord(
+        stream_url, media_type, media_id, _intern(media_title), season_number, episode_number, _intern(description),
+        created_at, expires_at, accessed_count
+    )
+    with _STORE_LOCK:
+        TOKEN_STORE[token] = record
+    return record
 
-def store_token_in_supabase(token, stream_url, media_type, media_id, media_title, season_number, episode_number, description=None):
-    """Store token in Supabase using REST API"""
+def send_token_to_supabase(token, record):
+    """Send a memory record to Supabase and return where the token is stored, for the API response"""
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        return 'Memory'
+
+    # Same timestamps as the memory copy, formatted once here
+    row = record.to_dict()
+    row['token'] = token
+
+    # Serverless instances freeze background threads once the response is sent, so write inline there
+    if SUPABASE_INLINE_WRITES:
+        return 'Supabase' if store_token_in_supabase([row]) else 'Memory'
+
+    _PENDING.put(row)
+    return 'Memory (Supabase write queued)'
+
+def store_token_in_supabase(rows):
+    """Bulk upsert token rows into Supabase using REST API (re-sending a batch is harmless)"""
     try:
         if not SUPABASE_URL or not SUPABASE_KEY:
             return False
-        
-        headers = {
-            'Authorization': f'Bearer {SUPABASE_KEY}',
-            'Content-Type': 'application/json',
-            'Prefer': 'return=minimal'
-        }
-        
-        data = {
-            'token': token,
-            'stream_url': stream_url,
-            'media_type': media_type,
-            'media_id': media_id,
-            'media_title': media_title,
-            'season_number': season_number,
-            'episode_number': episode_number,
-            'description': description,
-            'created_at': datetime.utcnow().isoformat(),
-            'expires_at': (datetime.utcnow() + timedelta(seconds=API_TOKEN_EXPIRY)).isoformat(),
-            'accessed_count': 0
-        }
-        
-        response = requests.post(
-            f'{SUPABASE_URL}/rest/v1/stream_urls',
-            headers=headers,
-            json=data,
-            timeout=5
+
+        response = SESSION.post(
+            _INSERT_URL,
+            headers=_WRITE_HEADERS,
+            json=rows,
+            timeout=SUPABASE_TIMEOUT
         )
-        
+
         if response.status_code in [200, 201]:
-            logger.info(f"Token stored in Supabase: {token[:8]}...")
+            logger.info(f"Stored {len(rows)} token(s) in Supabase")
             return True
         else:
             logger.warning(f"Failed to store in Supabase: {response.status_code} - {response.text}")
             return False
-            
+
     except Exception as e:
         logger.warning(f"Supabase storage failed: {e}. Using in-memory storage.")
         return False
 
+def insert_batch(batch):
+    """Insert one batch, keeping the tokens in memory if Supabase rejects it"""
+    try:
+        if not store_token_in_supabase(batch):
+            # Keep the tokens usable from this process even if the insert failed
+            for row in batch:
+                with _STORE_LOCK:
+                    cached = row['token'] in TOKEN_STORE
+                if not cached:
+                    store_token_in_memory(
+                        row['token'], row['stream_url'], row['media_type'], row['media_id'], row['media_title'],
+                        row['season_number'], row['episode_number'], row['description'],
+                        created_at=parse_timestamp(row['created_at']), expires_at=parse_timestamp(row['expires_at'])
+                    )
+    finally:
+        _FLUSH_SLOTS.release()
+
+def flush_pending_tokens():
+    """Background loop: insert queued tokens every SUPABASE_BATCH_SIZE items or SUPABASE_MAX_WAIT_MS"""
+    while True:
+        item = _PENDING.get()
+        if item is _STOP_FLUSH:
+            return
+        batch = [item]
+        stopping = False
+        deadline = time.monotonic() + SUPABASE_MAX_WAIT_MS / 1000
+
+        while len(batch) < SUPABASE_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = _PENDING.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP_FLUSH:
+                stopping = True
+                break
+            batch.append(item)
+
+        # Wait for a free slot - while all inserts are in flight the queue keeps filling the next batch
+        _FLUSH_SLOTS.acquire()
+        if stopping:
+            # The executor is already shut down at interpreter exit, so insert the last batch here
+            insert_batch(batch)
+            return
+        try:
+            _FLUSH_POOL.submit(insert_batch, batch)
+        except RuntimeError:
+            # Interpreter is shutting down and the executor no longer accepts work
+            insert_batch(batch)
+
+def drain_pending_tokens():
+    """On exit: stop the flush thread and insert whatever is still queued"""
+    if _FLUSH_THREAD is None:
+        return
+
+    _PENDING.put(_STOP_FLUSH)
+    _FLUSH_THREAD.join(timeout=10)
+
+    rows = []
+    while True:
+        try:
+            item = _PENDING.get_nowait()
+        except queue.Empty:
+            break
+        if item is not _STOP_FLUSH:
+            rows.append(item)
+    for start in range(0, len(rows), SUPABASE_BATCH_SIZE):
+        store_token_in_supabase(rows[start:start + SUPABASE_BATCH_SIZE])
+
+# Start the batched Supabase writer
+if SUPABASE_URL and SUPABASE_KEY and not SUPABASE_INLINE_WRITES:
+    _FLUSH_THREAD = threading.Thread(target=flush_pending_tokens, name='supabase-flush', daemon=True)
+    _FLUSH_THREAD.start()
+    atexit.register(drain_pending_tokens)
+
 def retrieve_token_from_memory(token):
     """Retrieve token from memory"""
-    if token in TOKEN_STORE:
-        data = TOKEN_STORE[token]
-        if datetime.fromisoformat(data['expires_at']) > datetime.utcnow():
-            data['accessed_count'] += 1
+    with _STORE_LOCK:
+        data = TOKEN_STORE.get(token)
+        # TTLCache expires by insertion time; tokens copied from Supabase can expire sooner
+        if data and data.expires_at > time.time():
+            data.accessed_count += 1
             return data
     return None
 
+def cache_token_from_supabase(token, row):
+    """Copy a Supabase row into the memory store so later reads skip the network"""
+    expires_at = parse_timestamp(row['expires_at'])
+    if expires_at <= time.time():
+        return None
+
+    return store_token_in_memory(
+        token, row['stream_url'], row['media_type'], row['media_id'], row.get('media_title'),
+        row.get('season_number'), row.get('episode_number'), row.get('description'),
+        created_at=parse_timestamp(row['created_at']) if row.get('created_at') else None, expires_at=expires_at,
+        accessed_count=(row.get('accessed_count') or 0) + 1
+    )
+
+# Shape of tokens this API issues: secrets.token_urlsafe(16), or the older uuid4 format
+TOKEN_PATTERN = re.compile(
+    r'[A-Za-z0-9_-]{22}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+)
+
 def retrieve_token_from_supabase(token):
     """Retrieve token from Supabase using REST API"""
     try:
         if not SUPABASE_URL or not SUPABASE_KEY:
             return None
         
-        headers = {
-            'Authorization': f'Bearer {SUPABASE_KEY}',
-            'Content-Type': 'application/json'
-        }
-        
-        response = requests.get(
-            f'{SUPABASE_URL}/rest/v1/stream_urls?token=eq.{token}',
-            headers=headers,
-            timeout=5
+        # Only the columns the memory record needs, at most one row
+        response = SESSION.get(
+            _SELECT_URL_TEMPLATE + quote(token, safe=''),
+            headers=_READ_HEADERS,
+            timeout=SUPABASE_TIMEOUT
         )
         
         if response.status_code == 200:
@@ -156,101 +385,118 @@ def retrieve_token_from_supabase(token):
         logger.warning(f"Supabase retrieval failed: {e}")
         return None
 
-@app.route('/', methods=['GET', 'OPTIONS'])
+def ojsonify(data, status=200):
+    """Build a JSON response with orjson instead of Flask's stdlib-based jsonify"""
+    return app.response_class(orjson.dumps(data), status=status, mimetype='application/json')
+
+# orjson only encodes 64-bit integers, so larger values are rejected up front instead of failing on get-url
+Int64 = Annotated[int, msgspec.Meta(ge=-(2 ** 63), le=2 ** 63 - 1)]
+
+class GenerateTokenRequest(msgspec.Struct):
+    """Body of POST /api/generate-token"""
+    stream_url: str
+    media_type: str
+    media_id: Union[Int64, str]
+    media_title: Optional[str] = 'Unknown'
+    season_number: Optional[Union[Int64, str]] = None
+    episode_number: Optional[Union[Int64, str]] = None
+    description: Optional[str] = None
+
+# Decodes and validates the raw body in one pass
+_GENERATE_TOKEN_DECODER = msgspec.json.Decoder(GenerateTokenRequest)
+
+# Static response bodies, serialized once at import
+_INDEX_BODY = orjson.dumps({
+    'name': 'Tuniwix Stream Token API (Simplified)',
+    'version': '2.0.0',
+    'status': 'running',
+    'storage': 'Supabase REST API + Memory Fallback',
+    'endpoints': {
+        'POST /api/generate-token': 'Generate a token for a stream URL',
+        'GET /api/get-url/<token>': 'Retrieve stream URL using token',
+        'GET /api/health': 'Check API health',
+    }
+})
+# Only tokens_in_memory changes, so it is filled into the pre-serialized body with %d
+_HEALTH_BODY_TEMPLATE = orjson.dumps({
+    'status': 'healthy',
+    'service': 'API running',
+    'storage': 'Hybrid (Supabase + Memory)'
+})[:-1] + b',"tokens_in_memory":%d}'
+
+@app.route('/')
 def index():
     """API info endpoint"""
-    if request.method == 'OPTIONS':
-        return '', 204
-    
-    return jsonify({
-        'name': 'Tuniwix Stream Token API (Simplified)',
-        'version': '2.0.0',
-        'status': 'running',
-        'storage': 'Supabase REST API + Memory Fallback',
-        'endpoints': {
-            'POST /api/generate-token': 'Generate a token for a stream URL',
-            'GET /api/get-url/<token>': 'Retrieve stream URL using token',
-            'GET /api/health': 'Check API health',
-        }
-    }), 200
+    return app.response_class(_INDEX_BODY, mimetype='application/json')
 
-@app.route('/api/health', methods=['GET', 'OPTIONS'])
+@app.route('/api/health')
 def api_health():
     """Health check endpoint"""
-    if request.method == 'OPTIONS':
-        return '', 204
-    
-    return jsonify({
-        'status': 'healthy',
-        'service': 'API running',
-        'storage': 'Hybrid (Supabase + Memory)',
-        'tokens_in_memory': len(TOKEN_STORE)
-    }), 200
-
-@app.route('/api/generate-token', methods=['POST', 'OPTIONS'])
+    # TTLCache.__len__ expires entries, so it needs the lock like any other access
+    with _STORE_LOCK:
+        tokens_in_memory = len(TOKEN_STORE)
+    return app.response_class(_HEALTH_BODY_TEMPLATE % tokens_in_memory, mimetype='application/json')
+
+@app.route('/api/generate-token', methods=['POST'])
 def api_generate_token():
     """Generate a token for a stream URL"""
-    if request.method == 'OPTIONS':
-        return '', 204
-        
     try:
-        data = request.get_json()
-        
-        if not data or 'stream_url' not in data or 'media_type' not in data or 'media_id' not in data:
-            return jsonify({'error': 'Missing required fields: stream_url, media_type, media_id'}), 400
-        
-        # Generate unique token
-        token = str(uuid.uuid4())
-        
-        stream_url = data.get('stream_url')
-        media_type = data.get('media_type')
-        media_id = data.get('media_id')
-        media_title = data.get('media_title', 'Unknown')
-        season_number = data.get('season_number')
-        episode_number = data.get('episode_number')
-        description = data.get('description')
-        
-        # Try to store in Supabase first, fallback to memory
-        supabase_success = store_token_in_supabase(
-            token, stream_url, media_type, media_id, media_title, season_number, episode_number, description
+        try:
+            data = _GENERATE_TOKEN_DECODER.decode(request.get_data(cache=False))
+        except msgspec.DecodeError as e:
+            return jsonify({'error': f'Invalid request body: {e}'}), 400
+
+        # Generate unique token (128 bits, URL-safe)
+        token = secrets.token_urlsafe(16)
+        media_type = data.media_type
+        media_id = data.media_id
+
+        # Store in memory right away so the token is readable before the Supabase batch is flushed
+        record = store_token_in_memory(
+            token, data.stream_url, media_type, media_id, data.media_title,
+            data.season_number, data.episode_number, data.description
         )
-        
-        if not supabase_success:
-            store_token_in_memory(
-                token, stream_url, media_type, media_id, media_title, season_number, episode_number, description
-            )
-        
+        storage = send_token_to_supabase(token, record)
+
         logger.info(f"Generated token: {token[:8]}... for {media_type} ID:{media_id}")
         
-        return jsonify({
+        return ojsonify({
             'success': True,
             'token': token,
             'expires_in': API_TOKEN_EXPIRY,
-            'storage': 'Supabase' if supabase_success else 'Memory'
-        }), 200
+            'storage': storage
+        })
         
     except Exception as e:
         logger.error(f"Error in generate-token: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/get-url/<token>', methods=['GET', 'OPTIONS'])
+@app.route('/api/get-url/<token>')
 def api_get_url(token):
     """Retrieve stream URL using token"""
-    if request.method == 'OPTIONS':
-        return '', 204
-        
     try:
-        # Try Supabase first
-        result = retrieve_token_from_supabase(token)
-        
-        # Fallback to memory
-        if not result:
-            result = retrieve_token_from_memory(token)
-        
+        # Memory first - freshly generated and recently fetched tokens never leave the process
+        result = retrieve_token_from_memory(token)
+
+        # Read-through from Supabase on a miss - tokens we could never have issued skip the round trip
+        if not result and TOKEN_PATTERN.fullmatch(token):
+            row = retrieve_token_from_supabase(token)
+            if row:
+                result = cache_token_from_supabase(token, row)
+
         if not result:
             return jsonify({'error': 'Invalid or expired token'}), 404
-        
-        return jsonify(result), 200
+
+        # The stream data behind a token is fixed for its lifetime, so browsers and CDNs may cache it until expiry
+        # accessed_count and the formatted timestamps can differ between responses, hence a weak ETag
+        remaining = max(int(result.expires_at - time.time()), 0)
+        if request.if_none_match.contains_weak(token):
+            response = app.response_class(status=304)
+        else:
+            response = ojsonify(result.to_dict())
+        response.headers['Cache-Control'] = f'public, max-age={remaining}, immutable'
+        response.set_etag(token, weak=True)
+        return response
         
     except Exception as e:
         logger.error(f"Error in get-url: {e}")
@@ -265,7 +511,19 @@ def server_error(error):
     logger.error(f"Server error: {error}")
     return jsonify({'error': 'Internal server error'}), 500
 
-# For local development
+# For local development - serve with gunicorn workers when available (see Procfile / wsgi.py)
 if __name__ == '__main__':
-    app.run(debug=False, host='0.0.0.0', port=5000)
+    port = os.getenv('PORT', '5000')
+    # The memory store is per process, so it only works as the source of truth with a single worker
+    workers = '4' if SUPABASE_URL and SUPABASE_KEY else '1'
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        logger.warning("gunicorn not installed - falling back to the threaded Flask dev server")
+        app.run(debug=False, host='0.0.0.0', port=int(port), threaded=True)
+    else:
+        os.execvp(sys.executable, [
+            sys.executable, '-m', 'gunicorn', '-w', workers, '-k', 'gthread', '--threads', '8',
+            '--bind', f'0.0.0.0:{port}', '--chdir', os.path.dirname(os.path.abspath(__file__)), 'wsgi:app'
+        ])
 
@@ -0,0 +1,12 @@
+"""
+WSGI entry point for gunicorn and other WSGI servers
+
+    gunicorn -w 4 -k gthread --threads 8 wsgi:app
+
+Multiple workers need Supabase configured - without it tokens live in one process's memory,
+so run a single worker (-w 1). `python index.py` picks the worker count automatically.
+"""
+
+from index import app  # noqa: F401
+
+__all__ = ['app']